@@ -1,4 +1,9 @@
 # data_utils.py
+import os
+import re
+import tempfile
+import unicodedata
+
 import pandas as pd
 
 def normalizar_compositor(nombre):
@@ -69,3 +74,105 @@ def preparar_para_guardar(df: pd.DataFrame) -> pd.DataFrame:
             else:
                 comp_prev = comp
     return df2
+
+def guardar_csv(df: pd.DataFrame, csv_path: str):
+    """
+    Escribe el CSV en UTF-8 con BOM de forma atómica: primero a un temporal en
+    la misma carpeta y luego os.replace, para que quien vigile el archivo nunca
+    lea una versión a medio escribir. Conserva los permisos del archivo existente.
+    """
+    carpeta = os.path.dirname(os.path.abspath(csv_path))
+    fd, temporal = tempfile.mkstemp(prefix=".guardar-", suffix=".csv", dir=carpeta)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8-sig", newline="") as archivo:
+            df.to_csv(archivo, index=False)
+        try:
+            modo = os.stat(csv_path).st_mode & 0o777
+        except OSError:
+            actual = os.umask(0)
+            os.umask(actual)
+            modo = 0o666 & ~actual
+        os.chmod(temporal, modo)
+        os.replace(temporal, csv_path)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+def normalizar_busqueda(s) -> str:
+    """
+    Minúsculas + sin tildes/diacríticos + espacios colapsados.
+    Si el valor es NaN o vacío, retorna cadena vacía.
+    """
+    if pd.isna(s) or s == "":
+        return ""
+    s = str(s).lower().strip()
+    s = unicodedata.normalize("NFD", s)
+    s = "".join(ch for ch in s if unicodedata.category(ch) != "Mn")
+    return " ".join(s.split())
+
+def variantes_compositor(nombre) -> set:
+    """
+    Genera variantes normalizadas de un compositor para la búsqueda:
+    con/sin paréntesis (fechas), sin coma y con el orden nombre/apellido
+    permutado, de modo que 'Alejandro Albornoz' coincida con
+    'Albornoz, Alejandro (1970–)'.
+    """
+    comp_full = "" if pd.isna(nombre) else str(nombre).strip()
+    comp_sin_paren = re.sub(r"\([^)]*\)", "", comp_full).strip()
+
+    variantes = {
+        normalizar_busqueda(comp_full),
+        normalizar_busqueda(comp_sin_paren),
+        normalizar_busqueda(" ".join(comp_full.replace(",", " ").split())),
+        normalizar_busqueda(" ".join(comp_sin_paren.replace(",", " ").split())),
+    }
+
+    fuente = comp_sin_paren if comp_sin_paren else comp_full
+    if "," in fuente:
+        ap, nom = [p.strip() for p in fuente.split(",", 1)]
+        for v in (f"{nom} {ap}", f"{ap} {nom}", f"{nom}{ap}", f"{ap}{nom}", nom, ap):
+            variantes.add(normalizar_busqueda(v))
+    else:
+        trozos = fuente.split()
+        if len(trozos) >= 2:
+            ap = trozos[-1]
+            nom = " ".join(trozos[:-1])
+            variantes.add(normalizar_busqueda(f"{nom} {ap}"))
+            variantes.add(normalizar_busqueda(f"{ap} {nom}"))
+    return variantes
+
+def entrada_busqueda(valores, compositor=None) -> tuple:
+    """
+    Entrada del índice de búsqueda para una fila: (texto normalizado de todas
+    las celdas, variantes del compositor). Se calcula una vez por fila.
+    """
+    texto = "\x1f".join(normalizar_busqueda(v) for v in valores)
+    variantes = variantes_compositor(compositor) if compositor is not None else set()
+    return texto, variantes
+
+def coincide_busqueda(entrada, query: str) -> bool:
+    """True si la consulta (ya normalizada) aparece en la fila indexada."""
+    texto, variantes = entrada
+    return query in texto or any(query in v for v in variantes)
+
+def indice_busqueda(df: pd.DataFrame) -> list:
+    """Índice de búsqueda por fila, en el orden del DataFrame."""
+    if "Compositor" in df.columns:
+        compositores = df["Compositor"].tolist()
+    else:
+        compositores = [None] * len(df)
+    return [
+        entrada_busqueda(fila, comp)
+        for fila, comp in zip(df.itertuples(index=False, name=None), compositores)
+    ]
+
+def filas_coincidentes(df: pd.DataFrame, consulta: str) -> list:
+    """
+    Devuelve las posiciones (0..n-1) de las filas que coinciden con la consulta,
+    con los mismos criterios que el buscador del editor. Consulta vacía = todas.
+    """
+    query = normalizar_busqueda(consulta)
+    if not query:
+        return list(range(len(df)))
+    return [i for i, entrada in enumerate(indice_busqueda(df)) if coincide_busqueda(entrada, query)]
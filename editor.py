@@ -1,19 +1,25 @@
 # editor.py
+import os
+
+import numpy as np
 import pandas as pd
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QTableWidget, QTableWidgetItem, QPushButton,
     QMessageBox, QLineEdit, QHBoxLayout, QDialog, QFormLayout, QLabel,
-    QDialogButtonBox, QHeaderView
+    QDialogButtonBox, QHeaderView, QCheckBox, QFileDialog
 )
-from PyQt5.QtCore import Qt, QSize
+from PyQt5.QtCore import Qt, QSize, QFileSystemWatcher, QTimer
 from PyQt5.QtGui import QIcon, QPen, QPainter, QColor
 
 from data_utils import (
-    cargar_catalogo, preparar_para_guardar,
-    normalizar_compositor, unificar_compositores
+    cargar_catalogo, preparar_para_guardar, guardar_csv,
+    normalizar_compositor, unificar_compositores,
+    normalizar_busqueda, indice_busqueda, entrada_busqueda, coincide_busqueda
+)
+from exportar import exportar_catalogo
+from sincronizar import (
+    hashes_catalogo, firma_archivo, planificar_recarga
 )
-import unicodedata
-import re
 # ---------------------------
 # Diálogo para agregar obra
 # ---------------------------
@@ -71,6 +77,34 @@ class DialogoAgregarObra(QDialog):
     def obtener_datos(self):
         return [self.entradas[col].text() for col in self.entradas]
 
+class DialogoExportar(QDialog):
+    """Elige los formatos de exportación y si se exportan solo los resultados de la búsqueda."""
+    FORMATOS = (("JSON Lines (.jsonl)", ".jsonl"),
+                ("Parquet (.parquet)", ".parquet"),
+                ("Catálogo HTML (.htm)", ".htm"))
+
+    def __init__(self, hay_busqueda=False, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Exportar catálogo")
+        layout = QVBoxLayout(self)
+        self.casillas = {}
+        for etiqueta, ext in self.FORMATOS:
+            casilla = QCheckBox(etiqueta, self)
+            casilla.setChecked(True)
+            layout.addWidget(casilla)
+            self.casillas[ext] = casilla
+        self.solo_busqueda = QCheckBox("Solo resultados de la búsqueda", self)
+        self.solo_busqueda.setChecked(hay_busqueda)
+        self.solo_busqueda.setEnabled(hay_busqueda)
+        layout.addWidget(self.solo_busqueda)
+        botones = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel, self)
+        botones.accepted.connect(self.accept)
+        botones.rejected.connect(self.reject)
+        layout.addWidget(botones)
+
+    def extensiones(self):
+        return [ext for ext, casilla in self.casillas.items() if casilla.isChecked()]
+
 # ---------------------------
 # Ventana principal
 # ---------------------------
@@ -124,9 +158,38 @@ class CatalogoEditor(QWidget):
         self.save_button.clicked.connect(self.guardar_cambios)
         self.layout.addWidget(self.save_button)
 
+        self.export_button = QPushButton("Exportar…")
+        self.export_button.clicked.connect(self.exportar)
+        self.layout.addWidget(self.export_button)
+
+        # Vigilar el CSV: si otro lo modifica, se incorporan solo las filas cambiadas
+        # (la ruta se registra en cada lectura completa, ver _cargar_desde_archivo)
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self._archivo_cambiado)
+        self._timer_recarga = QTimer(self)
+        self._timer_recarga.setSingleShot(True)
+        self._timer_recarga.setInterval(300)  # agrupa escrituras seguidas
+        self._timer_recarga.timeout.connect(self.recargar_cambios_externos)
+
         # Carga inicial
+        self._cargar_desde_archivo()
+        self.table.itemChanged.connect(self._celda_editada)
+
+    def _cargar_desde_archivo(self):
+        """
+        Lectura completa del CSV: DataFrame, tabla, índice de búsqueda y
+        hashes base (estado del archivo contra el que se comparan los cambios).
+        """
         self.df = cargar_catalogo(self.csv_path)
+        self._firma_archivo = firma_archivo(self.csv_path)
+        self._hashes_base = hashes_catalogo(self.df)
+        self._indice = indice_busqueda(self.df)
         self.mostrar_tabla(self.df)
+        if self.search_input.text().strip():
+            self.buscar()
+        # Si el archivo se borró o renombró, Qt dejó de vigilarlo
+        if self.csv_path not in self.watcher.files():
+            self.watcher.addPath(self.csv_path)
 
     # ---------------------------
     # Render de tabla
@@ -158,6 +221,8 @@ class CatalogoEditor(QWidget):
         """)
 
 
+        # Render programático: no es una edición del usuario
+        self.table.blockSignals(True)
         comp_anterior = None
         for i in range(len(df)):
             for j in range(len(df.columns)):
@@ -172,6 +237,98 @@ class CatalogoEditor(QWidget):
                 item = QTableWidgetItem(valor)
                 item.setFlags(item.flags() | Qt.ItemIsEditable)
                 self.table.setItem(i, j, item)
+        self.table.blockSignals(False)
+
+    def _texto_celda(self, valor) -> str:
+        return str(valor) if not pd.isna(valor) else ""
+
+    def _escribir_fila(self, fila):
+        """Escribe en la tabla la fila `fila` de self.df (sin ocultar compositores)."""
+        for j in range(len(self.df.columns)):
+            valor = self._texto_celda(self.df.iat[fila, j])
+            item = self.table.item(fila, j)
+            if item is None:
+                item = QTableWidgetItem(valor)
+                item.setFlags(item.flags() | Qt.ItemIsEditable)
+                self.table.setItem(fila, j, item)
+            elif item.text() != valor:
+                item.setText(valor)
+
+    def _refrescar_compositores(self, desde, hasta):
+        """Recalcula qué celdas de 'Compositor' van en blanco (repetidas) en las filas [desde, hasta)."""
+        if "Compositor" not in self.df.columns:
+            return
+        col = self.df.columns.get_loc("Compositor")
+        for fila in range(max(desde, 0), min(hasta, len(self.df))):
+            valor = self._texto_celda(self.df.iat[fila, col])
+            anterior = self._texto_celda(self.df.iat[fila - 1, col]) if fila > 0 else None
+            texto = "" if valor == anterior else valor
+            item = self.table.item(fila, col)
+            if item is not None and item.text() != texto:
+                item.setText(texto)
+
+    def _entrada_fila(self, fila):
+        comp = self.df["Compositor"].iat[fila] if "Compositor" in self.df.columns else None
+        return entrada_busqueda(self.df.iloc[fila].tolist(), comp)
+
+    def _celda_editada(self, item):
+        """
+        Refleja una edición del usuario en self.df y en el índice de búsqueda
+        (sin guardar aún), con las mismas reglas que guardar_cambios.
+        """
+        fila, col = item.row(), item.column()
+        if fila >= len(self.df) or col >= len(self.df.columns):
+            return
+        columna = self.df.columns[col]
+        if columna == "Compositor":
+            self._compositor_editado(fila, col, item.text())
+            return
+        self.df.iat[fila, col] = self._valor_para_df(columna, item.text())
+        self._indice[fila] = self._entrada_fila(fila)
+
+    def _valor_para_df(self, columna, texto):
+        """
+        Texto de la tabla -> valor para self.df, como lo dejaría cargar_catalogo:
+        vacío = nulo, y las columnas numéricas siguen siendo numéricas mientras el
+        texto sea un número (si no, la columna pasa a texto).
+        """
+        serie = self.df[columna]
+        if serie.dtype.kind not in "iufb":
+            return texto if texto != "" else pd.NA
+        try:
+            numero = float(texto) if texto.strip() else np.nan
+        except ValueError:
+            self.df[columna] = serie.astype(object)
+            return texto
+        if serie.dtype.kind in "iu" and numero.is_integer():
+            return int(numero)
+        if serie.dtype.kind != "f":
+            self.df[columna] = serie.astype(float)
+        return numero
+
+    def _compositor_editado(self, fila, col, texto):
+        """
+        Al guardar, un compositor en blanco hereda el de la fila anterior (ffill).
+        Por eso el cambio alcanza a la fila editada y a las siguientes que se ven
+        en blanco; y una celda vaciada hereda el compositor de la fila anterior.
+        """
+        if texto.strip():
+            nuevo = normalizar_compositor(texto)
+        elif fila > 0:
+            nuevo = self.df.iat[fila - 1, col]
+        else:
+            nuevo = ""
+
+        fin = fila + 1
+        while fin < len(self.df):
+            item = self.table.item(fin, col)
+            if item is not None and item.text().strip():
+                break
+            fin += 1
+
+        for f in range(fila, fin):
+            self.df.iat[f, col] = nuevo
+            self._indice[f] = self._entrada_fila(f)
     # ---------------------------
     # Acciones
     # ---------------------------
@@ -182,13 +339,17 @@ class CatalogoEditor(QWidget):
 
             # En la tabla (al final)
             fila_nueva = self.table.rowCount()
+            self.table.blockSignals(True)
             self.table.insertRow(fila_nueva)
             for col, valor in enumerate(datos):
                 self.table.setItem(fila_nueva, col, QTableWidgetItem(valor))
+            self.table.blockSignals(False)
 
-            # En el DataFrame
-            nueva_fila_df = pd.DataFrame([datos], columns=self.df.columns)
+            # En el DataFrame y el índice de búsqueda
+            valores = [self._valor_para_df(col, valor) for col, valor in zip(self.df.columns, datos)]
+            nueva_fila_df = pd.DataFrame([valores], columns=self.df.columns)
             self.df = pd.concat([self.df, nueva_fila_df], ignore_index=True)
+            self._indice.append(self._entrada_fila(fila_nueva))
 
     def eliminar_fila(self):
         fila = self.table.currentRow()
@@ -200,16 +361,15 @@ class CatalogoEditor(QWidget):
                                 QMessageBox.Yes | QMessageBox.No) == QMessageBox.Yes:
             # En la tabla
             self.table.removeRow(fila)
-            # En el DataFrame
+            # En el DataFrame y el índice de búsqueda
             self.df = self.df.drop(self.df.index[fila]).reset_index(drop=True)
+            del self._indice[fila]
 
-    def guardar_cambios(self):
+    def _tabla_a_dataframe(self):
         """
-        Sincroniza la tabla -> DataFrame, normaliza y guarda CSV 'visual':
-        - Ordena por Compositor
-        - Deja en blanco repetidos (solo visual para CSV)
+        Construye el catálogo desde lo que muestra la tabla (incluye ediciones
+        sin guardar), rellenando compositores en blanco y normalizándolos.
         """
-        # Tabla -> lista de filas
         datos = []
         for i in range(self.table.rowCount()):
             fila = []
@@ -218,133 +378,203 @@ class CatalogoEditor(QWidget):
                 fila.append(item.text() if item else "")
             datos.append(fila)
 
+        columnas = [self.table.horizontalHeaderItem(i).text() for i in range(self.table.columnCount())]
+        df = pd.DataFrame(datos, columns=columnas)
+
+        # Normalización y unificación
+        if "Compositor" in df.columns:
+            df["Compositor"] = df["Compositor"].replace("", pd.NA).ffill()
+            df["Compositor"] = df["Compositor"].apply(normalizar_compositor)
+            df = unificar_compositores(df)
+        return df
+
+    def guardar_cambios(self):
+        """
+        Sincroniza la tabla -> DataFrame, normaliza y guarda CSV 'visual':
+        - Ordena por Compositor
+        - Deja en blanco repetidos (solo visual para CSV)
+        Si otro modificó el archivo, primero se incorporan sus cambios.
+        """
+        if firma_archivo(self.csv_path) != self._firma_archivo and not self.recargar_cambios_externos():
+            QMessageBox.warning(self, "Archivo en uso",
+                                "Otra persona o programa está modificando el archivo y no se pudo leer.\n"
+                                "No se guardó nada para no sobrescribir su versión; "
+                                "intenta de nuevo en unos segundos.")
+            return
+
         try:
             # Construir DataFrame final desde la tabla
-            columnas = [self.table.horizontalHeaderItem(i).text() for i in range(self.table.columnCount())]
-            df_actualizado = pd.DataFrame(datos, columns=columnas)
-
-            # Normalización y unificación
-            if "Compositor" in df_actualizado.columns:
-                df_actualizado["Compositor"] = df_actualizado["Compositor"].replace("", pd.NA).ffill()
-                df_actualizado["Compositor"] = df_actualizado["Compositor"].apply(normalizar_compositor)
-                df_actualizado = unificar_compositores(df_actualizado)
+            df_actualizado = self._tabla_a_dataframe()
 
             # Preparar versión visual para CSV y guardar
             df_visual = preparar_para_guardar(df_actualizado)
-            df_visual.to_csv(self.csv_path, index=False, encoding="utf-8-sig")
+            guardar_csv(df_visual, self.csv_path)
 
+            # Releer lo guardado: nueva base para detectar cambios externos
+            # (y el watcher ignora esta escritura propia por la firma)
+            self._cargar_desde_archivo()
             QMessageBox.information(self, "Éxito", "Archivo guardado correctamente.")
-            self.df = df_actualizado  # estado interno actualizado
 
         except Exception as e:
             QMessageBox.critical(self, "Error", f"No se pudo guardar el archivo:\n{str(e)}")
 
+    def exportar(self):
+        """
+        Exporta el catálogo (o solo las filas visibles tras una búsqueda) a los
+        formatos elegidos, en una sola pasada por bloques. Se exporta el estado
+        de la tabla: self.df se mantiene al día con cada edición (_celda_editada),
+        con nulos y tipos igual que al exportar desde un script.
+        """
+        filas_visibles = [f for f in range(self.table.rowCount()) if not self.table.isRowHidden(f)]
+        hay_busqueda = len(filas_visibles) < self.table.rowCount()
+
+        dialogo = DialogoExportar(hay_busqueda, self)
+        if dialogo.exec_() != QDialog.Accepted:
+            return
+        extensiones = dialogo.extensiones()
+        if not extensiones:
+            QMessageBox.warning(self, "Sin formato", "Selecciona al menos un formato.")
+            return
+
+        base, _ = QFileDialog.getSaveFileName(self, "Exportar catálogo", "catalogo")
+        if not base:
+            return
+        base = os.path.splitext(base)[0]
+        salidas = [base + ext for ext in extensiones]
+        filas = filas_visibles if dialogo.solo_busqueda.isChecked() else None
+
+        try:
+            total = exportar_catalogo(self.df, salidas, filas=filas)
+            QMessageBox.information(self, "Éxito",
+                                    f"{total} obras exportadas a:\n" + "\n".join(salidas))
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"No se pudo exportar el catálogo:\n{str(e)}")
+
     # ---------------------------
-    # Búsqueda
+    # Cambios externos al CSV
     # ---------------------------
+    def _archivo_cambiado(self, ruta):
+        # Algunos programas reemplazan el archivo al guardar y el watcher deja de vigilarlo
+        if ruta not in self.watcher.files() and os.path.exists(ruta):
+            self.watcher.addPath(ruta)
+        self._timer_recarga.start()
 
-    def _normalize(self, s: str) -> str:
-        """Minúsculas + sin tildes/diacríticos."""
-        if not s:
-            return ""
-        s = str(s).lower().strip()
-        # Eliminar tildes usando NFD
-        s = unicodedata.normalize("NFD", s)
-        s = "".join(ch for ch in s if unicodedata.category(ch) != "Mn")
-        # Colapsar espacios
-        s = " ".join(s.split())
-            
-        return s
-
-    def _sin_parentesis(self, s: str) -> str:
-        """Quita todo lo que esté entre paréntesis (p.ej. fechas)."""
-        if not s:
-            return ""
-        return re.sub(r"\([^)]*\)", "", s).strip()
+    def recargar_cambios_externos(self):
+        """
+        Incorpora los cambios que otros hicieron al CSV, fila por fila:
+        compara hashes de fila base/local/archivo y solo toca las filas distintas
+        en la tabla, self.df y el índice de búsqueda.
+        Si un cambio externo afecta obras editadas sin guardar, pregunta qué hacer
+        solo para esas obras; el resto de las ediciones locales se conserva.
+        Retorna False si el archivo no se pudo leer (p.ej. está a medio escribir).
+        """
+        if self.csv_path not in self.watcher.files() and os.path.exists(self.csv_path):
+            self.watcher.addPath(self.csv_path)
+        firma = firma_archivo(self.csv_path)
+        if firma is None or firma == self._firma_archivo:
+            return True  # borrado o escritura propia
+        try:
+            df_remoto = cargar_catalogo(self.csv_path)
+        except Exception:
+            return False  # archivo a medio escribir: llegará otro aviso del watcher
+
+        hashes_remotos = hashes_catalogo(df_remoto)
+        hashes_locales = hashes_catalogo(self.df)
+        hay_ediciones = hashes_locales != self._hashes_base
+
+        if list(df_remoto.columns) != list(self.df.columns):
+            # Cambiaron las columnas: no hay diff por filas, se recarga todo
+            if hay_ediciones and QMessageBox.question(
+                    self, "Archivo modificado",
+                    "Otra persona cambió las columnas del catálogo.\n\n"
+                    "¿Recargar el archivo y descartar tus ediciones sin guardar?",
+                    QMessageBox.Yes | QMessageBox.No) != QMessageBox.Yes:
+                self._firma_archivo = firma
+                return True
+            self._cargar_desde_archivo()
+            return True
+
+        aplicables, conflictos = planificar_recarga(self._hashes_base, hashes_locales, hashes_remotos)
+        if conflictos and QMessageBox.question(
+                self, "Conflicto con cambios externos",
+                f"Otra persona modificó el archivo y {len(conflictos)} de sus cambios "
+                "afectan obras que editaste sin guardar.\n\n"
+                "¿Usar la versión del archivo en esas obras?\n"
+                "(No = conservar tus ediciones en esas obras. "
+                "Tus demás ediciones se conservan en ambos casos)",
+                QMessageBox.Yes | QMessageBox.No) == QMessageBox.Yes:
+            aplicables = aplicables + conflictos
+
+        self._aplicar_cambios(df_remoto, aplicables)
+        self._hashes_base = hashes_remotos
+        self._firma_archivo = firma
+        return True
+
+    def _aplicar_cambios(self, df_remoto, cambios):
+        """
+        Aplica cada Cambio(pos, borrar, desde, hasta): en la posición local `pos`
+        reemplaza `borrar` filas por las filas [desde, hasta) de df_remoto.
+        """
+        if not cambios:
+            return
+        cambios = sorted(cambios, key=lambda c: c.pos)
+
+        # DataFrame: una sola concatenación de tramos intactos + filas nuevas,
+        # anotando dónde quedan las filas nuevas en el resultado
+        tramos, previo, desplazamiento, rangos = [], 0, 0, []
+        for c in cambios:
+            tramos.append(self.df.iloc[previo:c.pos])
+            tramos.append(df_remoto.iloc[c.desde:c.hasta])
+            previo = c.pos + c.borrar
+            inicio = c.pos + desplazamiento
+            rangos.append((inicio, inicio + c.hasta - c.desde))
+            desplazamiento += (c.hasta - c.desde) - c.borrar
+        tramos.append(self.df.iloc[previo:])
+        tramos = [t for t in tramos if len(t)] or [self.df.iloc[0:0]]
+        self.df = pd.concat(tramos, ignore_index=True)
+
+        query = normalizar_busqueda(self.search_input.text())
+        self.table.blockSignals(True)
+        try:
+            # Tabla e índice: de abajo hacia arriba, así las posiciones siguen siendo válidas
+            for c in reversed(cambios):
+                nuevas = c.hasta - c.desde
+                comunes = min(c.borrar, nuevas)
+                for _ in range(c.borrar - comunes):
+                    self.table.removeRow(c.pos + comunes)
+                for k in range(comunes, nuevas):
+                    self.table.insertRow(c.pos + k)
+                self._indice[c.pos:c.pos + c.borrar] = [None] * nuevas
+
+            for inicio, fin in rangos:
+                for fila in range(inicio, fin):
+                    self._escribir_fila(fila)
+                    self._indice[fila] = self._entrada_fila(fila)
+                    if query:
+                        self.table.setRowHidden(fila, not coincide_busqueda(self._indice[fila], query))
+                # La fila siguiente puede pasar a mostrar (u ocultar) su compositor
+                self._refrescar_compositores(inicio, fin + 1)
+        finally:
+            self.table.blockSignals(False)
 
+    # ---------------------------
+    # Búsqueda
+    # ---------------------------
 
     def buscar(self):
         """
         Filtra filas de forma insensible a tildes y al orden nombre/apellido.
-        Para 'Compositor', usa el valor REAL de self.df (puede estar oculto en la vista),
-        y genera variantes sin paréntesis para que 'Alejandro Albornoz' matchee
-        aunque el dato sea 'Albornoz, Alejandro (1970–)'.
+        Usa el índice por fila (self._indice), con el valor REAL del compositor
+        (puede estar oculto en la vista) y sus variantes sin paréntesis, para que
+        'Alejandro Albornoz' matchee aunque el dato sea 'Albornoz, Alejandro (1970–)'.
         """
-        query = self._normalize(self.search_input.text())
+        query = normalizar_busqueda(self.search_input.text())
         if not query:
             self.restablecer_busqueda()
             return
 
-        # Mapa de headers (por si cambiaste el orden de columnas)
-        headers = [self.table.horizontalHeaderItem(i).text() for i in range(self.table.columnCount())]
-        try:
-            col_compositor = headers.index("Compositor")
-        except ValueError:
-            col_compositor = -1
-
         for fila in range(self.table.rowCount()):
-            visible = False
-
-            # 1) Búsqueda general: cualquier columna (lo que se ve en la tabla)
-            fila_texto_norm = []
-            for col in range(self.table.columnCount()):
-                item = self.table.item(fila, col)
-                texto_celda = item.text() if item else ""
-                norm = self._normalize(texto_celda)
-                fila_texto_norm.append(norm)
-                if query in norm:
-                    visible = True
-                    break
-
-            # 2) Tratamiento especial para 'Compositor' usando el valor real del DF
-            if not visible and col_compositor != -1:
-                try:
-                    comp_full = str(self.df.at[fila, "Compositor"])
-                except Exception:
-                    comp_full = self.table.item(fila, col_compositor).text() if self.table.item(fila, col_compositor) else ""
-
-                comp_full = comp_full.strip()
-
-                # versión sin paréntesis (p.ej. quitar fechas)
-                comp_sin_paren = self._sin_parentesis(comp_full)
-
-                variantes = set()
-
-                # Base: tal cual y sin paréntesis
-                variantes.add(self._normalize(comp_full))
-                variantes.add(self._normalize(comp_sin_paren))
-
-                # Sin coma (y colapsando espacios)
-                sin_coma_full = " ".join(comp_full.replace(",", " ").split())
-                sin_coma_sin_paren = " ".join(comp_sin_paren.replace(",", " ").split())
-                variantes.add(self._normalize(sin_coma_full))
-                variantes.add(self._normalize(sin_coma_sin_paren))
-
-                # Si viene como "Apellido, Nombre (...)"
-                fuente = comp_sin_paren if comp_sin_paren else comp_full
-                if "," in fuente:
-                    ap, nom = [p.strip() for p in fuente.split(",", 1)]
-                    # "Nombre Apellido" y "Apellido Nombre"
-                    variantes.add(self._normalize(f"{nom} {ap}"))
-                    variantes.add(self._normalize(f"{ap} {nom}"))
-                    # También sus versiones sin espacios extra
-                    variantes.add(self._normalize(f"{nom}{ap}"))
-                    variantes.add(self._normalize(f"{ap}{nom}"))
-                    # Solo nombre / solo apellido
-                    variantes.add(self._normalize(nom))
-                    variantes.add(self._normalize(ap))
-                else:
-                    # Si no hay coma, intenta partir por espacios y permutar
-                    trozos = fuente.split()
-                    if len(trozos) >= 2:
-                        ap = trozos[-1]
-                        nom = " ".join(trozos[:-1])
-                        variantes.add(self._normalize(f"{nom} {ap}"))
-                        variantes.add(self._normalize(f"{ap} {nom}"))
-
-                if any(query in v for v in variantes):
-                    visible = True
-
+            visible = fila < len(self._indice) and coincide_busqueda(self._indice[fila], query)
             self.table.setRowHidden(fila, not visible)
 
     def restablecer_busqueda(self):
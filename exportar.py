@@ -0,0 +1,341 @@
+# exportar.py
+"""
+Exportación del catálogo normalizado a varios formatos en una sola pasada.
+
+El DataFrame se recorre por bloques (sin copiarlo entero) y cada bloque se
+entrega a todos los escritores activos:
+- JSON Lines (.jsonl) para el servicio de búsqueda.
+- Parquet (.parquet) para análisis (requiere pyarrow).
+- HTML (.htm/.html) con el estilo de CatalogoGeneral.htm para publicación.
+
+Uso desde script:
+    python exportar.py catalogo_inicial.csv salida.jsonl salida.parquet salida.htm
+    python exportar.py catalogo_inicial.csv albornoz.jsonl --buscar "albornoz"
+"""
+import argparse
+import html
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from data_utils import cargar_catalogo, filas_coincidentes
+
+TAMANO_BLOQUE = 500
+
+# ---------------------------
+# Recorrido por bloques
+# ---------------------------
+
+def iterar_bloques(df: pd.DataFrame, filas=None, tamano_bloque: int = TAMANO_BLOQUE):
+    """
+    Entrega el catálogo en bloques de como máximo `tamano_bloque` filas.
+    Si se indican `filas` (posiciones 0..n-1, p.ej. resultado de una búsqueda),
+    solo se recorren esas filas, en ese orden. Solo se materializa un bloque a la vez.
+    """
+    if filas is None:
+        for inicio in range(0, len(df), tamano_bloque):
+            yield df.iloc[inicio:inicio + tamano_bloque]
+    else:
+        filas = list(filas)
+        for inicio in range(0, len(filas), tamano_bloque):
+            yield df.iloc[filas[inicio:inicio + tamano_bloque]]
+
+# ---------------------------
+# Escritores
+# ---------------------------
+
+class EscritorExportacion:
+    """
+    Interfaz común de los escritores: abrir(columnas, tipos) -> escribir_bloque(bloque)* -> cerrar().
+    `tipos` es el mapa columna -> dtype del catálogo completo.
+    Las subclases declaran las extensiones que manejan en `extensiones`.
+    """
+    extensiones = ()
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.filas_escritas = 0
+
+    def abrir(self, columnas, tipos=None):
+        raise NotImplementedError
+
+    def escribir_bloque(self, bloque: pd.DataFrame):
+        raise NotImplementedError
+
+    def cerrar(self):
+        raise NotImplementedError
+
+
+class EscritorJSONL(EscritorExportacion):
+    """Una obra por línea, como objeto JSON (NaN -> null)."""
+    extensiones = (".jsonl",)
+
+    def abrir(self, columnas, tipos=None):
+        self.columnas = list(columnas)
+        self._archivo = open(self.ruta, "w", encoding="utf-8", newline="\n")
+
+    def escribir_bloque(self, bloque):
+        for fila in bloque.itertuples(index=False, name=None):
+            registro = {
+                col: (None if pd.isna(valor) else valor)
+                for col, valor in zip(self.columnas, fila)
+            }
+            self._archivo.write(json.dumps(registro, ensure_ascii=False, default=self._a_json))
+            self._archivo.write("\n")
+        self.filas_escritas += len(bloque)
+
+    @staticmethod
+    def _a_json(valor):
+        """Escalares numpy -> tipos nativos; el resto como texto."""
+        if isinstance(valor, np.generic):
+            return valor.item()
+        return str(valor)
+
+    def cerrar(self):
+        self._archivo.close()
+
+
+class EscritorParquet(EscritorExportacion):
+    """
+    Escribe un row group por bloque con pyarrow.ParquetWriter.
+    Las columnas no numéricas se guardan siempre como texto para que el
+    esquema sea el mismo en todos los bloques.
+    """
+    extensiones = (".parquet",)
+
+    def __init__(self, ruta):
+        super().__init__(ruta)
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Para exportar a Parquet instala pyarrow: pip install pyarrow") from e
+        self._pa = pa
+        self._pq = pq
+
+    def abrir(self, columnas, tipos=None):
+        pa = self._pa
+        tipos = tipos or {}
+        campos = []
+        self._texto = []
+        for col in columnas:
+            tipo = tipos.get(col)
+            if isinstance(tipo, np.dtype) and tipo.kind in "iuf":
+                campos.append(pa.field(str(col), pa.from_numpy_dtype(tipo)))
+            else:
+                campos.append(pa.field(str(col), pa.string()))
+                self._texto.append(col)
+        self._esquema = pa.schema(campos)
+        self._writer = self._pq.ParquetWriter(self.ruta, self._esquema)
+
+    def escribir_bloque(self, bloque):
+        columnas = {}
+        for col in bloque.columns:
+            serie = bloque[col]
+            if col in self._texto:
+                columnas[str(col)] = [None if pd.isna(v) else str(v) for v in serie]
+            else:
+                columnas[str(col)] = serie.to_numpy()
+        tabla = self._pa.Table.from_pydict(columnas, schema=self._esquema)
+        self._writer.write_table(tabla)
+        self.filas_escritas += len(bloque)
+
+    def cerrar(self):
+        self._writer.close()
+
+
+class EscritorHTML(EscritorExportacion):
+    """
+    Regenera el catálogo HTML con el estilo de CatalogoGeneral.htm:
+    tabla de 740 px, Verdana 9pt, encabezado gris y fondo alternado por compositor.
+    El compositor se escribe solo en su primera obra (igual que el CSV 'visual');
+    exportar_catalogo entrega las filas ya ordenadas por compositor.
+    """
+    extensiones = (".htm", ".html")
+
+    TITULO = "Catálogo general de obras electroacústicas de compositores chilenos"
+    COLORES = ("yellow", "#FFFF99")
+
+    def abrir(self, columnas, tipos=None):
+        self.columnas = list(columnas)
+        self._comp_anterior = None
+        self._grupo = -1
+        self._archivo = open(self.ruta, "w", encoding="utf-8", newline="\n")
+        titulo = html.escape(self.TITULO)
+        self._archivo.write(
+            "<html>\n\t<head>\n"
+            f'\t\t<meta name="Title" content="{titulo}">\n'
+            '\t\t<meta http-equiv="Content-Type" content="text/html;charset=utf-8">\n'
+            f"\t\t<title>{titulo}</title>\n"
+            "\t</head>\n"
+            '\t<body class="Normal" bgcolor="#FFFFFF">\n'
+            f"\t\t<p>{self._celda_texto(titulo, negrita=True)}</p>\n"
+            '\t\t<table width="740" cellpadding="0" border="1">\n'
+            "\t\t\t<tr>\n"
+        )
+        for col in self.columnas:
+            self._archivo.write(
+                f'\t\t\t\t<td class="Normal" bgcolor="silver">'
+                f"<p>{self._celda_texto(html.escape(str(col)))}</p></td>\n"
+            )
+        self._archivo.write("\t\t\t</tr>\n")
+
+    @staticmethod
+    def _celda_texto(texto, negrita=False):
+        contenido = f'<font size="1">{texto}</font>'
+        if negrita:
+            contenido = f"<b>{contenido}</b>"
+        return f'<span style="font-size:9.0pt;font-family:Verdana">{contenido}</span>'
+
+    def escribir_bloque(self, bloque):
+        partes = []
+        for fila in bloque.itertuples(index=False, name=None):
+            valores = dict(zip(self.columnas, fila))
+            comp = valores.get("Compositor")
+            if comp != self._comp_anterior:
+                self._grupo += 1
+                self._comp_anterior = comp
+                nuevo_grupo = True
+            else:
+                nuevo_grupo = False
+            color = self.COLORES[self._grupo % len(self.COLORES)]
+
+            partes.append("\t\t\t<tr>\n")
+            for col in self.columnas:
+                valor = valores[col]
+                texto = "" if pd.isna(valor) else html.escape(str(valor))
+                es_comp = col == "Compositor"
+                if es_comp and not nuevo_grupo:
+                    texto = ""
+                partes.append(
+                    f'\t\t\t\t<td class="Normal" bgcolor="{color}">'
+                    f"<p>{self._celda_texto(texto or '&nbsp;', negrita=es_comp)}</p></td>\n"
+                )
+            partes.append("\t\t\t</tr>\n")
+        self._archivo.write("".join(partes))
+        self.filas_escritas += len(bloque)
+
+    def cerrar(self):
+        self._archivo.write("\t\t</table>\n\t</body>\n</html>\n")
+        self._archivo.close()
+
+
+ESCRITORES = (EscritorJSONL, EscritorParquet, EscritorHTML)
+
+def escritor_para_ruta(ruta) -> EscritorExportacion:
+    """Elige el escritor según la extensión del archivo de salida."""
+    ext = os.path.splitext(str(ruta))[1].lower()
+    for clase in ESCRITORES:
+        if ext in clase.extensiones:
+            return clase(ruta)
+    soportadas = ", ".join(e for clase in ESCRITORES for e in clase.extensiones)
+    raise ValueError(f"Formato no soportado: '{ext}'. Usa uno de: {soportadas}")
+
+# ---------------------------
+# Exportación
+# ---------------------------
+
+def _umask() -> int:
+    actual = os.umask(0)
+    os.umask(actual)
+    return actual
+
+def posiciones_por_compositor(df: pd.DataFrame, filas=None) -> list:
+    """
+    Posiciones de `filas` (o de todo el catálogo) ordenadas por 'Compositor' (A-Z),
+    como en preparar_para_guardar. Orden estable: dentro de un compositor se
+    conserva el orden original. No copia el DataFrame.
+    """
+    posiciones = list(range(len(df))) if filas is None else list(filas)
+    if "Compositor" not in df.columns or not posiciones:
+        return posiciones
+    compositores = df["Compositor"].iloc[posiciones].reset_index(drop=True)
+    orden = compositores.sort_values(kind="stable").index
+    return [posiciones[i] for i in orden]
+
+def exportar_catalogo(df: pd.DataFrame, salidas, filas=None, tamano_bloque: int = TAMANO_BLOQUE) -> int:
+    """
+    Exporta `df` a todas las `salidas` (rutas o escritores) en una sola pasada,
+    ordenado por compositor. `filas` restringe la exportación a esas posiciones
+    (p.ej. una búsqueda). Retorna la cantidad de obras exportadas.
+
+    Cada escritor trabaja sobre un archivo temporal en la misma carpeta; solo si
+    todos terminan bien se renombran a sus rutas finales. Si alguno falla, se
+    borran los temporales y no queda ninguna salida a medias.
+    """
+    if tamano_bloque < 1:
+        raise ValueError(f"El tamaño de bloque debe ser al menos 1 (se recibió {tamano_bloque})")
+    escritores = [
+        s if isinstance(s, EscritorExportacion) else escritor_para_ruta(s)
+        for s in salidas
+    ]
+    destinos = []
+    for escritor in escritores:
+        destino = escritor.ruta
+        carpeta = os.path.dirname(os.path.abspath(destino))
+        fd, temporal = tempfile.mkstemp(prefix=".exportar-", suffix=os.path.splitext(destino)[1], dir=carpeta)
+        os.close(fd)
+        os.chmod(temporal, 0o666 & ~_umask())  # mkstemp crea con 0600
+        escritor.ruta = temporal
+        destinos.append((escritor, destino))
+
+    abiertos = []
+    total = 0
+    try:
+        try:
+            for escritor in escritores:
+                escritor.abrir(df.columns, tipos=df.dtypes.to_dict())
+                abiertos.append(escritor)
+
+            filas = posiciones_por_compositor(df, filas)
+            for bloque in iterar_bloques(df, filas, tamano_bloque):
+                for escritor in abiertos:
+                    escritor.escribir_bloque(bloque)
+                total += len(bloque)
+        finally:
+            for escritor in abiertos:
+                escritor.cerrar()
+
+        for escritor, destino in destinos:
+            os.replace(escritor.ruta, destino)
+            escritor.ruta = destino
+    except BaseException:
+        for escritor, destino in destinos:
+            if escritor.ruta != destino and os.path.exists(escritor.ruta):
+                os.remove(escritor.ruta)
+            escritor.ruta = destino
+        raise
+    return total
+
+
+def _entero_positivo(texto) -> int:
+    try:
+        valor = int(texto)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{texto}' no es un número entero")
+    if valor < 1:
+        raise argparse.ArgumentTypeError(f"debe ser al menos 1 (se recibió {valor})")
+    return valor
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta el catálogo a JSONL, Parquet y/o HTML.")
+    parser.add_argument("csv", help="CSV del catálogo (p.ej. catalogo_inicial.csv)")
+    parser.add_argument("salidas", nargs="+", help="Archivos de salida (.jsonl, .parquet, .htm/.html)")
+    parser.add_argument("--buscar", default="", help="Exporta solo las obras que coinciden con la búsqueda")
+    parser.add_argument("--bloque", type=_entero_positivo, default=TAMANO_BLOQUE, help="Filas por bloque")
+    args = parser.parse_args(argv)
+
+    df = cargar_catalogo(args.csv)
+    filas = filas_coincidentes(df, args.buscar) if args.buscar else None
+    try:
+        total = exportar_catalogo(df, args.salidas, filas=filas, tamano_bloque=args.bloque)
+    except (ValueError, ImportError) as e:
+        parser.error(str(e))
+    print(f"{total} obras exportadas a: {', '.join(args.salidas)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+# sincronizar.py
+"""
+Diferencias por fila entre versiones del catálogo, para recargar de forma
+incremental un CSV modificado por otra persona o script.
+
+Cada fila se identifica por un hash estable de sus valores (un digest corto
+por celda, para poder medir cuánto se parecen dos filas). Se comparan tres
+secuencias de hashes:
+- base: el archivo tal como se leyó/guardó por última vez,
+- local: el estado en memoria (con ediciones sin guardar),
+- remoto: el archivo tal como está ahora en disco.
+Los cambios base -> remoto sobre filas no editadas localmente se aplican
+directamente; solo son conflicto las filas cambiadas en ambos lados.
+"""
+import hashlib
+import os
+from bisect import bisect_right
+from collections import namedtuple
+from itertools import accumulate
+from difflib import SequenceMatcher
+
+import pandas as pd
+
+# En la posición local `pos`, reemplazar `borrar` filas por las filas remotas [desde, hasta)
+Cambio = namedtuple("Cambio", ["pos", "borrar", "desde", "hasta"])
+
+
+def hash_fila(valores) -> tuple:
+    """
+    Hash estable de una fila: tupla con un digest de 8 bytes por celda.
+    NaN y vacío cuentan igual, y se ignoran espacios al inicio/final, para que
+    la fila leída del CSV y la editada en la tabla coincidan.
+    """
+    return tuple(
+        hashlib.blake2b(("" if pd.isna(v) else str(v).strip()).encode("utf-8"), digest_size=8).digest()
+        for v in valores
+    )
+
+def hashes_catalogo(df: pd.DataFrame) -> list:
+    """Lista de hashes por fila, en el orden del DataFrame."""
+    return [hash_fila(fila) for fila in df.itertuples(index=False, name=None)]
+
+def firma_archivo(ruta):
+    """(mtime_ns, tamaño) del archivo, o None si no existe."""
+    try:
+        st = os.stat(ruta)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _opcodes(a, b):
+    """Bloques no iguales entre dos secuencias de hashes."""
+    return [op for op in SequenceMatcher(None, a, b, autojunk=False).get_opcodes() if op[0] != "equal"]
+
+# Dos filas son "la misma obra editada" si coinciden en al menos esta fracción de celdas
+SIMILITUD_MINIMA = 0.5
+# Por encima de este tamaño (filas a x filas b) un bloque no se alinea: borrado + inserción
+MAX_CELDAS_ALINEACION = 250_000
+
+def _similitud(fila_a, fila_b) -> float:
+    if not fila_a or len(fila_a) != len(fila_b):
+        return 0.0
+    return sum(x == y for x, y in zip(fila_a, fila_b)) / len(fila_a)
+
+def _alinear(a, b) -> list:
+    """
+    Empareja filas de dos bloques de distinto tamaño (pares (k, l) crecientes),
+    maximizando la similitud total entre filas parecidas. Las filas sin pareja
+    son borrados (en a) o inserciones (en b).
+    """
+    n, m = len(a), len(b)
+    if n * m > MAX_CELDAS_ALINEACION:
+        return []
+    sim = [[_similitud(fa, fb) for fb in b] for fa in a]
+    # puntaje[k][l]: mejor alineación de a[:k] con b[:l]
+    puntaje = [[0.0] * (m + 1) for _ in range(n + 1)]
+    for k in range(1, n + 1):
+        for l in range(1, m + 1):
+            mejor = max(puntaje[k - 1][l], puntaje[k][l - 1])
+            s = sim[k - 1][l - 1]
+            if s >= SIMILITUD_MINIMA:
+                mejor = max(mejor, puntaje[k - 1][l - 1] + s)
+            puntaje[k][l] = mejor
+    pares = []
+    k, l = n, m
+    while k and l:
+        s = sim[k - 1][l - 1]
+        if s >= SIMILITUD_MINIMA and puntaje[k][l] == puntaje[k - 1][l - 1] + s:
+            pares.append((k - 1, l - 1))
+            k, l = k - 1, l - 1
+        elif puntaje[k][l] == puntaje[k - 1][l]:
+            k -= 1
+        else:
+            l -= 1
+    return pares[::-1]
+
+def _cambios_por_fila(a, b):
+    """
+    Opcodes a -> b partidos en cambios mínimos (i1, i2, j1, j2), en orden:
+    reemplazo o borrado de UNA fila de `a` (i2 = i1 + 1), o inserción en un
+    punto (i1 = i2). En reemplazos del mismo tamaño las filas se emparejan por
+    posición; si los tamaños difieren, por similitud (_alinear), para que
+    "borrar la fila 5 y editar la 6" no se lea como "editar la 5 y borrar la 6".
+    """
+    cambios = []
+    for _, i1, i2, j1, j2 in _opcodes(a, b):
+        if i2 - i1 == j2 - j1:
+            pares = [(k, k) for k in range(i2 - i1)]
+        else:
+            pares = _alinear(a[i1:i2], b[j1:j2])
+        k_prev, l_prev = 0, 0
+        for k, l in pares + [(i2 - i1, j2 - j1)]:
+            for kk in range(k_prev, k):
+                cambios.append((i1 + kk, i1 + kk + 1, j1 + l_prev, j1 + l_prev))
+            if l > l_prev:
+                cambios.append((i1 + k, i1 + k, j1 + l_prev, j1 + l))
+            if k < i2 - i1:
+                cambios.append((i1 + k, i1 + k + 1, j1 + l, j1 + l + 1))
+            k_prev, l_prev = k + 1, l + 1
+    return cambios
+
+def planificar_recarga(base, local, remoto):
+    """
+    Fusión a tres bandas sobre hashes de fila, fila por fila.
+    Retorna (aplicables, conflictos), ambos como Cambio en posiciones de `local`:
+    - aplicables: cambios remotos sobre filas no editadas localmente, e inserciones
+      remotas (van después de lo insertado localmente en el mismo punto).
+    - conflictos: filas editadas (o borradas) en ambos lados con resultado distinto;
+      aplicarlos reemplaza la versión local de ESA fila por la del archivo.
+    Las ediciones locales que no están en conflicto nunca se tocan.
+    """
+    locales = _cambios_por_fila(base, local)
+    editadas = {}  # fila base -> (n.º de filas locales que la reemplazan, 0 = borrada; sus hashes)
+    for i1, i2, j1, j2 in locales:
+        if i2 > i1:
+            editadas[i1] = (j2 - j1, local[j1:j2])
+
+    # Posición local de una posición base: se suman los desplazamientos de los
+    # cambios locales que terminan antes (o en) ese punto
+    # (los cambios vienen ordenados por posición base)
+    limites = [i2 for _, i2, _, _ in locales]
+    acumulado = [0] + list(accumulate((j2 - j1) - (i2 - i1) for i1, i2, j1, j2 in locales))
+
+    def posicion_local(i):
+        return i + acumulado[bisect_right(limites, i)]
+
+    aplicables, conflictos = [], []
+    for i1, i2, j1, j2 in _cambios_por_fila(base, remoto):
+        if i1 == i2 or i1 not in editadas:
+            aplicables.append(Cambio(posicion_local(i1), i2 - i1, j1, j2))
+            continue
+        n_local, filas_locales = editadas[i1]
+        if filas_locales == remoto[j1:j2]:
+            continue  # mismo resultado en ambos lados
+        conflictos.append(Cambio(posicion_local(i1), n_local, j1, j2))
+    return aplicables, conflictos
@@ -0,0 +1,75 @@
+# test_sincronizar.py
+import os
+
+from data_utils import cargar_catalogo
+from sincronizar import hash_fila, hashes_catalogo, planificar_recarga
+
+CSV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalogo_inicial.csv")
+
+
+def aplicar(local, cambios, remoto):
+    """Aplica Cambio(pos, borrar, desde, hasta) sobre una copia de `local`, como el editor."""
+    resultado = list(local)
+    for c in sorted(cambios, key=lambda c: c.pos, reverse=True):
+        resultado[c.pos:c.pos + c.borrar] = remoto[c.desde:c.hasta]
+    return resultado
+
+
+def filas(*obras):
+    return [hash_fila(["Compositor, Uno (1950)", obra, "2000", "5'00"]) for obra in obras]
+
+
+def test_sin_ediciones_locales_aplica_todo():
+    base = filas("A", "B", "C", "D")
+    remoto = filas("A", "X", "C", "D", "E")
+    aplicables, conflictos = planificar_recarga(base, list(base), remoto)
+    assert conflictos == []
+    assert aplicar(base, aplicables, remoto) == remoto
+
+
+def test_insercion_junto_a_fila_editada_no_es_conflicto():
+    base = filas("A", "B", "C", "D")
+    local = filas("A", "B-local", "C", "D")
+    remoto = filas("A", "B", "Nueva", "C", "D")
+    aplicables, conflictos = planificar_recarga(base, local, remoto)
+    assert conflictos == []
+    assert aplicar(local, aplicables, remoto) == filas("A", "B-local", "Nueva", "C", "D")
+
+
+def test_conflicto_solo_afecta_filas_editadas_en_ambos_lados():
+    base = filas("A", "B", "C", "D", "E")
+    local = filas("A", "B-local", "C", "D", "E-local")
+    remoto = filas("A", "B-remota", "C-remota", "D", "E")
+    aplicables, conflictos = planificar_recarga(base, local, remoto)
+    assert len(conflictos) == 1
+    # "No": se conserva la edición local en conflicto
+    assert aplicar(local, aplicables, remoto) == filas("A", "B-local", "C-remota", "D", "E-local")
+    # "Sí": solo la fila en conflicto toma la versión del archivo
+    assert aplicar(local, aplicables + conflictos, remoto) == filas("A", "B-remota", "C-remota", "D", "E-local")
+
+
+def test_borrado_y_edicion_contiguos_no_duplican_la_obra():
+    # Remoto borra la fila 5 y edita la 6; localmente se editó la 6.
+    df = cargar_catalogo(CSV_PATH)
+    base = hashes_catalogo(df)
+
+    local_df = df.copy()
+    local_df.iat[6, 1] = "LOCAL6"
+    local = hashes_catalogo(local_df)
+
+    remoto_df = df.copy()
+    remoto_df.iat[6, 1] = "REMOTA6"
+    remoto_df = remoto_df.drop(index=5).reset_index(drop=True)
+    remoto = hashes_catalogo(remoto_df)
+
+    aplicables, conflictos = planificar_recarga(base, local, remoto)
+    assert len(conflictos) == 1
+
+    # "No" (conservar mis ediciones): la fila 5 se borra y la 6 queda con la edición local
+    conservar = aplicar(local, aplicables, remoto)
+    assert len(conservar) == len(df) - 1
+    assert conservar[5] == local[6]
+    assert hash_fila(remoto_df.iloc[5].tolist()) not in conservar
+
+    # "Sí" (usar el archivo): queda igual que el archivo
+    assert aplicar(local, aplicables + conflictos, remoto) == remoto